@@ -1,8 +1,18 @@
 # this project involves generating prefix trees for words 
 
 import doctest
+import hashlib
+import heapq
+import os
+import pickle
+import tempfile
+from array import array
+from bisect import bisect_left
+from collections import Counter, deque
 from text_tokenize import tokenize_sentences
 
+# letters that autocorrect may insert or substitute
+ALPHABET = frozenset("abcdefghijklmnopqrstuvwxyz")
 
 def check_valid_key(key):
     if not isinstance(key, str):
@@ -12,17 +22,32 @@ class PrefixTree:
     """
     PrefixTree objects represent individual nodes in a prefix tree
     """
+    __slots__ = ("value", "children")
+
     def __init__(self):
         self.value = None
         self.children = {}
 
+    def _add_child(self, char):
+        """
+        Return the child reached by char, creating it if necessary
+        """
+        children = self.children
+        child = children.get(char)
+        if child is None:
+            child = children[char] = PrefixTree()
+        return child
+
+    def _descend(self, key):
+        """
+        Return the node reached by following key, or None if there is none
+        """
+        return self._descend_from(self, key)
+
     def get_prefix_tree(self, key):
-        current = self
-        for node in key:
-            if node in current.children:
-                current = current.children[node]
-            else:
-                raise KeyError
+        current = self._descend(key)
+        if current is None:
+            raise KeyError
         return current
 
     def __setitem__(self, key, value):
@@ -33,10 +58,8 @@ class PrefixTree:
         """
         check_valid_key(key)
         current = self
-        for node in key:
-            if node not in current.children:
-                current.children[node] = PrefixTree()
-            current = current.children[node]
+        for char in key:
+            current = current._add_child(char)
         current.value = value
 
     def __getitem__(self, key):
@@ -66,11 +89,7 @@ class PrefixTree:
             raise KeyError
 
     def present_node(self, key):
-        try:
-            self.get_prefix_tree(key)
-        except KeyError:
-            return False
-        return True
+        return self._descend(key) is not None
 
     def __contains__(self, key):
         """
@@ -78,13 +97,8 @@ class PrefixTree:
         Raise a TypeError if the given key is not a string.
         """
         check_valid_key(key)
-        try:
-            current = self.get_prefix_tree(key)
-        except KeyError:
-            return False
-        if current.value is not None:
-            return True
-        return False
+        current = self._descend(key)
+        return current is not None and current.value is not None
 
     def __iter__(self):
         def helper(self, prefix):
@@ -94,23 +108,183 @@ class PrefixTree:
                 yield from helper(child, prefix+letter)
         yield from helper(self, "")
 
+    def freeze(self):
+        """
+        Return a read-only FrozenTrie holding the same keys and values, for
+        storing the tree compactly
+        """
+        return FrozenTrie(self)
+
+    # read-only traversal interface shared with FrozenTrie, whose nodes are
+    # integer indexes rather than objects
+    def _root(self):
+        return self
+
+    def _value(self, node):
+        return node.value
+
+    def _children(self, node):
+        return node.children.items()
+
+    def _child_of(self, node, char):
+        return node.children.get(char)
+
+    def _descend_from(self, node, key):
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def _items(self, node):
+        return iter(node)
+
+
+class FrozenTrie:
+    """
+    Read-only copy of a PrefixTree laid out in flat arrays.  Nodes are
+    numbered breadth-first from the root (node 0); the children of node i are
+    entries child_start[i] up to child_end[i] of child_char and child_node,
+    sorted by character code.
+
+    This is a storage form: it takes a fraction of the memory of the
+    PrefixTree it copies, but queries on it are slower than on the PrefixTree,
+    so thaw it back into one before running many queries.
+    """
+    __slots__ = ("child_start", "child_end", "child_char", "child_node", "values")
+
+    def __init__(self, tree):
+        self.child_start = array("l")
+        self.child_end = array("l")
+        self.child_char = array("l")
+        self.child_node = array("l")
+        self.values = [tree.value]
+        queue = deque([tree])
+        while queue:
+            node = queue.popleft()
+            self.child_start.append(len(self.child_char))
+            for char, child in sorted(node.children.items()):
+                self.child_char.append(ord(char))
+                self.child_node.append(len(self.values))
+                self.values.append(child.value)
+                queue.append(child)
+            self.child_end.append(len(self.child_char))
+
+    def thaw(self):
+        """
+        Return a PrefixTree holding the same keys and values
+        """
+        nodes = [PrefixTree() for _ in self.values]
+        child_char = self.child_char
+        child_node = self.child_node
+        for node, value, start, end in zip(
+            nodes, self.values, self.child_start, self.child_end
+        ):
+            node.value = value
+            children = node.children
+            for edge in range(start, end):
+                children[chr(child_char[edge])] = nodes[child_node[edge]]
+        return nodes[0]
+
+    def _root(self):
+        return 0
+
+    def _value(self, node):
+        return self.values[node]
+
+    def _children(self, node):
+        child_char = self.child_char
+        child_node = self.child_node
+        for edge in range(self.child_start[node], self.child_end[node]):
+            yield chr(child_char[edge]), child_node[edge]
+
+    def _child_of(self, node, char):
+        end = self.child_end[node]
+        code = ord(char)
+        edge = bisect_left(self.child_char, code, self.child_start[node], end)
+        if edge < end and self.child_char[edge] == code:
+            return self.child_node[edge]
+        return None
+
+    def _descend(self, key):
+        return self._descend_from(0, key)
+
+    def _descend_from(self, node, key):
+        for char in key:
+            node = self._child_of(node, char)
+            if node is None:
+                return None
+        return node
+
+    def _items(self, node):
+        child_start = self.child_start
+        child_end = self.child_end
+        child_char = self.child_char
+        child_node = self.child_node
+        values = self.values
+        stack = [(node, "")]
+        while stack:
+            node, prefix = stack.pop()
+            if values[node] is not None:
+                yield (prefix, values[node])
+            for edge in range(child_end[node] - 1, child_start[node] - 1, -1):
+                stack.append((child_node[edge], prefix + chr(child_char[edge])))
+
+    def __getitem__(self, key):
+        check_valid_key(key)
+        node = self._descend(key)
+        if node is None or self.values[node] is None:
+            raise KeyError
+        return self.values[node]
+
+    def __contains__(self, key):
+        check_valid_key(key)
+        node = self._descend(key)
+        return node is not None and self.values[node] is not None
+
+    def __iter__(self):
+        return self._items(0)
+
 
 def create_frequency_dict(sentences):
-    frequency_dict = {}
-    for sentence in sentences:
-        word_list = sentence.split()
-        for word in word_list:
-            frequency_dict.setdefault(word, 0)
-            frequency_dict[word] += 1
-    return frequency_dict
+    return Counter(word for sentence in sentences for word in sentence.split())
 
 
-def word_frequencies(text):
+def word_frequencies(text, cache_path=None):
     """
     Given a piece of text as a single string, create a prefix tree whose keys
     are the words in the text, and whose values are the number of times the
     associated word appears in the text.
+
+    If cache_path names a directory, the finished tree is frozen and pickled
+    there under a hash of the text, and later calls with the same text thaw it
+    instead of tokenizing and counting the text again.  Cache files are read
+    with pickle.load, which can run arbitrary code, so cache_path must only
+    hold files written by this function.
     """
+    if cache_path is None:
+        return build_frequency_tree(text)
+    digest = hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+    cache_file = os.path.join(cache_path, digest + ".pkl")
+    if os.path.exists(cache_file):
+        with open(cache_file, "rb") as file:
+            return pickle.load(file).thaw()
+    prefix_tree = build_frequency_tree(text)
+    os.makedirs(cache_path, exist_ok=True)
+    # write to a temporary file and move it into place, so that a crash or a
+    # concurrent writer never leaves a truncated cache file behind
+    file_descriptor, temp_file = tempfile.mkstemp(dir=cache_path, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "wb") as file:
+            pickle.dump(prefix_tree.freeze(), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, cache_file)
+    except BaseException:
+        os.remove(temp_file)
+        raise
+    return prefix_tree
+
+
+def build_frequency_tree(text):
     sentences = tokenize_sentences(text)
     word_frequency_dict = create_frequency_dict(sentences)
     prefix_tree = PrefixTree()
@@ -127,53 +301,85 @@ def autocomplete(tree, prefix, max_count=None):
     """
     Return the list of the most-frequently occurring elements that start with
     the given prefix.  Include only the top max_count elements if max_count is
-    specified, otherwise return all.
+    specified, otherwise return all.  tree may be a PrefixTree or a FrozenTrie.
 
     Raise a TypeError if the given prefix is not a string.
     """
     if not isinstance(prefix, str):
         raise TypeError
-    if not tree.present_node(prefix):
+    node = tree._descend(prefix)
+    if node is None:
         return []
-    subtree_list = list(tree.get_prefix_tree(prefix))
-    if prefix in tree:
-        subtree_list.append(("", tree[prefix]))
-    subtree_list = sorted(subtree_list, key=lambda x: x[1], reverse=True)
+    subtree_list = list(tree._items(node))
     if max_count is None:
-        return remove_tuple(prefix, subtree_list)
-    return remove_tuple(prefix, subtree_list[:max_count])
+        subtree_list.sort(key=lambda x: x[1], reverse=True)
+    else:
+        subtree_list = heapq.nlargest(max_count, subtree_list, key=lambda x: x[1])
+    return remove_tuple(prefix, subtree_list)
 
 
 def single_char_insertion(tree, word):
-    alphabet = "abcdefghijklmnopqrstuvwxyz"
+    descend_from = tree._descend_from
+    value_of = tree._value
+    # node is where word[:i] ends, shared by every edit made at position i
+    node = tree._root()
     for i in range(len(word) + 1):
-        for letter in alphabet:
-            potential_word = word[:i] + letter + word[i:]
-            if potential_word in tree:
-                yield (potential_word, tree[potential_word])
+        rest = word[i:]
+        for letter, child in tree._children(node):
+            if letter not in ALPHABET:
+                continue
+            end = descend_from(child, rest)
+            if end is not None and value_of(end) is not None:
+                yield (word[:i] + letter + rest, value_of(end))
+        if i < len(word):
+            node = tree._child_of(node, word[i])
+            if node is None:
+                return
 
 
 def single_char_deletion(tree, word):
-    for i in range(len(word)):
-        potential_word = word[:i] + word[i + 1 :]
-        if potential_word in tree:
-            yield (potential_word, tree[potential_word])
+    descend_from = tree._descend_from
+    value_of = tree._value
+    node = tree._root()
+    for i, char in enumerate(word):
+        end = descend_from(node, word[i + 1 :])
+        if end is not None and value_of(end) is not None:
+            yield (word[:i] + word[i + 1 :], value_of(end))
+        node = tree._child_of(node, char)
+        if node is None:
+            return
 
 
 def single_char_replacement(tree, word):
-    alphabet = "abcdefghijklmnopqrstuvwxyz"
-    for i, _ in enumerate(word):
-        for letter in alphabet:
-            if letter != word[i]:
-                potential_word = word[:i] + letter + word[i + 1 :]
-                if potential_word in tree:
-                    yield (potential_word, tree[potential_word])
+    descend_from = tree._descend_from
+    value_of = tree._value
+    node = tree._root()
+    for i, char in enumerate(word):
+        rest = word[i + 1 :]
+        for letter, child in tree._children(node):
+            if letter != char and letter in ALPHABET:
+                end = descend_from(child, rest)
+                if end is not None and value_of(end) is not None:
+                    yield (word[:i] + letter + rest, value_of(end))
+        node = tree._child_of(node, char)
+        if node is None:
+            return
+
 
 def transpose(tree, word):
+    descend_from = tree._descend_from
+    value_of = tree._value
+    node = tree._root()
     for i in range(len(word) - 1):
-        potential_word = word[:i] + word[i + 1] + word[i] + word[i + 2 :]
-        if potential_word in tree:
-            yield (potential_word, tree[potential_word])
+        # swapping equal letters would give back the word itself
+        if word[i] != word[i + 1]:
+            swapped = word[i + 1] + word[i] + word[i + 2 :]
+            end = descend_from(node, swapped)
+            if end is not None and value_of(end) is not None:
+                yield (word[:i] + swapped, value_of(end))
+        node = tree._child_of(node, word[i])
+        if node is None:
+            return
 
 
 def autocorrect(tree, prefix, max_count=None):
@@ -186,18 +392,21 @@ def autocorrect(tree, prefix, max_count=None):
     """
     autocomplete_set = set(autocomplete(tree, prefix, max_count))
     if max_count is not None and len(autocomplete_set) >= max_count:
-        return autocomplete_set
-    valid_edits = set()
-    for function in (single_char_insertion, single_char_deletion, 
+        return list(autocomplete_set)
+    valid_edits = {}
+    for function in (single_char_insertion, single_char_deletion,
                      single_char_replacement, transpose):
-        valid_edits.update({edit for edit in function(tree, prefix) 
-                            if edit[0] not in autocomplete_set})
-    sorted_edits = sorted(list(valid_edits), key=lambda x: x[1], reverse=True)
+        valid_edits.update(
+            edit for edit in function(tree, prefix)
+            if edit[0] not in autocomplete_set
+        )
     if max_count is None:
-        return list(autocomplete_set) + [edit[0] for edit in sorted_edits]
-    return list(autocomplete_set) + [
-        edit[0] for edit in sorted_edits[: (max_count - len(autocomplete_set))]
-    ]
+        sorted_edits = sorted(valid_edits, key=valid_edits.get, reverse=True)
+    else:
+        sorted_edits = heapq.nlargest(
+            max_count - len(autocomplete_set), valid_edits, key=valid_edits.get
+        )
+    return list(autocomplete_set) + sorted_edits
 
 
 def word_filter(tree, pattern):
@@ -207,39 +416,37 @@ def word_filter(tree, pattern):
          * matches any sequence of zero or more characters,
          ? matches any single character,
          otherwise char in pattern char must equal char in word.
+    tree may be a PrefixTree or a FrozenTrie.
     """
-    if pattern == "" and tree.value is None:
-        return []
-    if pattern == "" and tree.value is not None:
-        return [("", tree.value)]
-    first, rest = pattern[0], pattern[1:]
-    if first not in tree.children and first != "*" and first != "?":
-        return []
-    if first not in ("*", "?"):
-        return [
-            (first + word[0], word[1])
-            for word in word_filter(tree.children[first], rest)
-        ]
-    elif first == "?":
-        return [
-            (child + word[0], word[1])
-            for child in tree.children
-            for word in word_filter(tree.children[child], rest)
-        ]
-    else:
-        star_list = []
-        star_list.extend(
-            [word for word in word_filter(tree, rest) if word not in star_list]
-        )
-        for child in tree.children:
-            star_list.extend(
-                [
-                    (child + word[0], word[1])
-                    for word in word_filter(tree.children[child], pattern)
-                    if (child + word[0], word[1]) not in star_list
-                ]
-            )
-        return star_list
+    value_of = tree._value
+    children_of = tree._children
+    child_of = tree._child_of
+    results = {}
+    seen = set()
+    stack = [(tree._root(), 0, "")]
+    while stack:
+        node, index, prefix = stack.pop()
+        state = (node, index)
+        if state in seen:
+            continue
+        seen.add(state)
+        if index == len(pattern):
+            if value_of(node) is not None:
+                results[prefix] = value_of(node)
+            continue
+        char = pattern[index]
+        if char == "*":
+            stack.append((node, index + 1, prefix))
+            for letter, child in children_of(node):
+                stack.append((child, index, prefix + letter))
+        elif char == "?":
+            for letter, child in children_of(node):
+                stack.append((child, index + 1, prefix + letter))
+        else:
+            child = child_of(node, char)
+            if child is not None:
+                stack.append((child, index + 1, prefix + char))
+    return list(results.items())
 
 if __name__ == "__main__":
     doctest.testmod()
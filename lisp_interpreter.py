@@ -1,7 +1,9 @@
 # this is a simplified interpreter for LISP
 
 #!/usr/bin/env python3
+import re
 import sys
+from itertools import islice
 
 sys.setrecursionlimit(20_000)
 
@@ -20,30 +22,32 @@ class Frame:
     """
     Creates object associated with frames (ex. global frames) in Scheme
     """
+    __slots__ = ("parent", "variables")
 
     def __init__(self, parent, variables):
         self.parent = parent
         self.variables = variables
 
     def __getitem__(self, variable):
-        if variable in self.variables:
-            return self.variables[variable]
-        else:
-            try:
-                return self.parent[variable]
-            except (KeyError, TypeError) as exc:
-                raise SchemeNameError from exc
+        frame = self
+        while frame is not None:
+            variables = frame.variables
+            if variable in variables:
+                return variables[variable]
+            frame = frame.parent
+        raise SchemeNameError
 
     def __setitem__(self, variable, value):
         variable_viability(variable)
         self.variables[variable] = value
 
     def __contains__(self, variable):
-        try:
-            _ = self[variable]
-            return True
-        except SchemeNameError:
-            return False
+        frame = self
+        while frame is not None:
+            if variable in frame.variables:
+                return True
+            frame = frame.parent
+        return False
 
 
 def make_initial_frame():
@@ -51,16 +55,26 @@ def make_initial_frame():
 
 
 def create_variable_dict(parameters, arguments):
-    variable_dict = {}
-    for i, parameter in enumerate(parameters):
-        variable_dict[parameter] = arguments[i]
-    return variable_dict
+    return dict(zip(parameters, arguments))
+
+
+class TailCall:
+    """
+    A call to a Function found in tail position, returned by evaluate_tail
+    instead of being made so that Function.__call__ can run it in a loop
+    """
+    __slots__ = ("function", "arguments")
+
+    def __init__(self, function, arguments):
+        self.function = function
+        self.arguments = arguments
 
 
 class Function:
     """
     Create object corresponding to a function in Scheme
     """
+    __slots__ = ("parameters", "body", "enclosing_frame")
 
     def __init__(self, parameters, body, enclosing_frame):
         self.parameters = parameters
@@ -68,15 +82,23 @@ class Function:
         self.enclosing_frame = enclosing_frame
 
     def __call__(self, arguments):
-        if len(arguments) != len(self.parameters):
-            raise SchemeEvaluationError
-        function_frame = Frame(
-            self.enclosing_frame, create_variable_dict(self.parameters, arguments)
-        )
-        return evaluate(self.body, function_frame)
+        function = self
+        while True:
+            if len(arguments) != len(function.parameters):
+                raise SchemeEvaluationError
+            function_frame = Frame(
+                function.enclosing_frame,
+                create_variable_dict(function.parameters, arguments),
+            )
+            result = evaluate_tail(function.body, function_frame)
+            if not isinstance(result, TailCall):
+                return result
+            function, arguments = result.function, result.arguments
 
 
 class Pair:
+    __slots__ = ("car", "cdr")
+
     def __init__(self, car, cdr):
         self.car = car
         self.cdr = cdr
@@ -85,6 +107,49 @@ class Pair:
         return "Pair: " + str(self.car) + " " + str(self.cdr)
 
 
+class SchemeList(Pair):
+    """
+    A non-empty Scheme list built by list or append.  The elements are kept
+    in a Python list, and start marks where this list begins so that taking
+    the cdr can share the same storage instead of copying it.  The cdr is
+    built once and kept in tail, so that it is the same object every time, as
+    it would be in a chain of Pairs.  It subclasses Pair so that it is still
+    recognised as one, with car and cdr computed from the shared storage
+    instead of held in the inherited slots.
+    """
+    __slots__ = ("elements", "start", "tail")
+
+    def __init__(self, elements, start=0):
+        self.elements = elements
+        self.start = start
+        self.tail = None
+
+    @property
+    def car(self):
+        return self.elements[self.start]
+
+    @property
+    def cdr(self):
+        if self.tail is None:
+            if self.start + 1 == len(self.elements):
+                self.tail = []
+            else:
+                self.tail = SchemeList(self.elements, self.start + 1)
+        return self.tail
+
+    def __len__(self):
+        return len(self.elements) - self.start
+
+    def __iter__(self):
+        return islice(self.elements, self.start, None)
+
+    def __getitem__(self, index):
+        return self.elements[self.start + index]
+
+    def __str__(self):
+        return "".join("Pair: " + str(element) + " " for element in self) + "[]"
+
+
 #############################
 # Scheme-related Exceptions #
 #############################
@@ -130,10 +195,14 @@ class SchemeEvaluationError(SchemeError):
 ############################
 
 
+NUMERIC_PREFIX = frozenset("0123456789+-.")
+
+
 def number_or_symbol(value):
     """
     Helper function: given a string, convert it to an integer or a float if
-    possible; otherwise, return the string itself
+    possible; otherwise, return the string itself (interned, so that
+    repeated names are cheap to look up)
 
     >>> number_or_symbol('8')
     8
@@ -144,31 +213,19 @@ def number_or_symbol(value):
     >>> number_or_symbol('x')
     'x'
     """
+    if not value or value[0] not in NUMERIC_PREFIX or value in ("+", "-", "."):
+        return sys.intern(value)
     try:
         return int(value)
     except ValueError:
         try:
             return float(value)
         except ValueError:
-            return value
+            return sys.intern(value)
 
 
-def modify_string(string):
-    """
-    Helper function for handling comments and new lines in code
-    """
-    modified_str = ""
-    comment = False
-    for char in string:
-        if char == ";":
-            comment = True
-            continue
-        if comment:
-            if char == "\n":
-                comment = False
-            continue
-        modified_str += char
-    return modified_str.replace("\n", " ")
+COMMENT_PATTERN = re.compile(r";[^\n]*")
+TOKEN_PATTERN = re.compile(r"\(|\)|[^\s()]+")
 
 
 def tokenize(source):
@@ -180,32 +237,7 @@ def tokenize(source):
         source (str): a string containing the source code of a Scheme
                       expression
     """
-    modified_str = ""
-    for char in modify_string(source):
-        if char == "(":
-            modified_str += char + " "
-        elif char == ")":
-            modified_str += " " + char + " "
-        else:
-            modified_str += char
-    modified_str = modified_str.split(" ")
-    return [char for char in modified_str if char != ""]
-
-
-def isvalid(tokens):
-    """
-    Returns True if the input is valid in Scheme syntax, else False
-    """
-    if len(tokens) != 1 and (tokens[0] != "(" or tokens[-1] != ")"):
-        return False
-    open_count = 0
-    close_count = 0
-    for element in tokens:
-        if element == "(":
-            open_count += 1
-        if element == ")":
-            close_count += 1
-    return open_count == close_count
+    return TOKEN_PATTERN.findall(COMMENT_PATTERN.sub("", source))
 
 
 def parse(tokens):
@@ -218,32 +250,21 @@ def parse(tokens):
     Arguments:
         tokens (list): a list of strings representing tokens
     """
-    if not isvalid(tokens):
-        raise SchemeSyntaxError
-    parse_list = []
-
-    def parse_expression(index):
-        if tokens[index] == "(":
-            s_expression = []
-            i = index
-            while True:
-                i += 1
-                if tokens[i] == "(":
-                    inner_expr, end_i = parse_expression(i)
-                    s_expression.append(inner_expr)
-                    i = end_i
-                elif tokens[i] == ")":
-                    break
-                else:
-                    s_expression.append(number_or_symbol(tokens[i]))
-            return s_expression, i
+    # stack[-1] is the S-expression currently being filled in
+    stack = [[]]
+    for token in tokens:
+        if token == "(":
+            stack.append([])
+        elif token == ")":
+            if len(stack) == 1:
+                raise SchemeSyntaxError
+            s_expression = stack.pop()
+            stack[-1].append(s_expression)
         else:
-            parse_list.append(number_or_symbol(tokens[index]))
-            return (number_or_symbol(tokens[index]), index + 1)
-
-    final_expr, _ = parse_expression(0)
-    parse_list = final_expr
-    return parse_list
+            stack[-1].append(number_or_symbol(token))
+    if len(stack) != 1 or len(stack[0]) != 1:
+        raise SchemeSyntaxError
+    return stack[0][0]
 
 
 ######################
@@ -335,19 +356,23 @@ def get_cdr(cons_cell):
 def type_check_list(inp):
     if len(inp) != 1:
         raise SchemeEvaluationError
-    return [] in inp or (isinstance(inp[0], Pair) and (type_check_list([inp[0].cdr])))
+    linked = inp[0]
+    # walk plain cons cells only; a SchemeList is always a proper list
+    while type(linked) is Pair:
+        linked = linked.cdr
+    return linked == [] or isinstance(linked, SchemeList)
 
 
 def list_length(ll):
     if not type_check_list(ll):
         raise SchemeEvaluationError
 
-    def length_helper(ll, sofar=0):
-        if not ll:
-            return sofar
-        return length_helper(ll.cdr, sofar + 1)
-
-    return length_helper(ll[0])
+    length = 0
+    linked = ll[0]
+    while type(linked) is Pair:
+        length += 1
+        linked = linked.cdr
+    return length + len(linked)
 
 
 def list_reference(inp):
@@ -365,16 +390,16 @@ def list_reference(inp):
     if (
         not type_check_list([ll])
         or not isinstance(index, int)
-        or list_length([ll]) <= index
+        or not 0 <= index < list_length([ll])
     ):
         raise SchemeEvaluationError
 
-    def ref_helper(linked, i):
-        if i == index:
-            return linked.car
-        return ref_helper(linked.cdr, i + 1)
-
-    return ref_helper(ll, 0)
+    while type(ll) is Pair:
+        if index == 0:
+            return ll.car
+        index -= 1
+        ll = ll.cdr
+    return ll[index]
 
 
 def all_lists(lists):
@@ -390,21 +415,18 @@ def solo_list_extraction(elt):
     values and return as a Python list.
     """
     list_elements = []
-
-    def extraction_helper(linked):
-        if not linked:
-            return None
-        list_elements.append(linked.car)
-        return extraction_helper(linked.cdr)
-
-    extraction_helper(elt)
+    while type(elt) is Pair:
+        list_elements.append(elt.car)
+        elt = elt.cdr
+    if elt:
+        list_elements.extend(elt)
     return list_elements
 
 
 def concatenate_list(list_elts):
     if not list_elts:
         return []
-    return Pair(list_elts[0], concatenate_list(list_elts[1:]))
+    return SchemeList(list_elts)
 
 
 def append(lists):
@@ -416,7 +438,15 @@ def append(lists):
     return concatenate_list(list_elts)
 
 
-scheme_builtins = {
+def intern_keys(mapping):
+    """
+    Return a copy of mapping whose string keys are interned, matching the
+    interned symbols produced by the parser
+    """
+    return {sys.intern(key): value for key, value in mapping.items()}
+
+
+scheme_builtins = intern_keys({
     "+": sum,
     "-": lambda args: -args[0] if len(args) == 1 else (args[0] - sum(args[1:])),
     "*": multiply,
@@ -437,7 +467,7 @@ scheme_builtins = {
     "length": list_length,
     "list-ref": list_reference,
     "append": append,
-}
+})
 
 
 ##############
@@ -452,15 +482,39 @@ def simplify_non_list(tree, frame):
         return frame[tree]
 
 
+def evaluate_define(tree, frame):
+    if isinstance(tree[1], list):
+        implicit_func = evaluate(["lambda", tree[1][1:], tree[2]], frame)
+        frame[tree[1][0]] = implicit_func
+        return frame[tree[1][0]]
+    else:
+        frame[tree[1]] = evaluate(tree[2], frame)
+        return frame[tree[1]]
+
+
+def evaluate_cons(tree, frame):
+    if len(tree[1:]) != 2:
+        raise SchemeEvaluationError
+    if not tree[2]:
+        return Pair(tree[1], [])
+    return Pair(evaluate(tree[1], frame), evaluate(tree[2], frame))
+
+
+def evaluate_begin(tree, frame):
+    for inp in tree[1:-1]:
+        evaluate(inp, frame)
+    return evaluate(tree[-1], frame)
+
+
 def evaluate_and(tree, frame):
-    for expression in tree:
+    for expression in tree[1:]:
         if not evaluate(expression, frame):
             return False
     return True
 
 
 def evaluate_or(tree, frame):
-    for expression in tree:
+    for expression in tree[1:]:
         if evaluate(expression, frame):
             return True
     return False
@@ -473,37 +527,69 @@ def evaluate_conditional(tree, frame):
 
 
 def create_linked_list(tree, frame):
-    if not tree:
-        return []
-    return Pair(evaluate(tree[0], frame), create_linked_list(tree[1:], frame))
+    return concatenate_list([evaluate(element, frame) for element in tree])
 
 
 def delete_variables(tree, frame):
-    if len(tree) != 1:
+    if len(tree) != 2:
         raise SchemeEvaluationError
-    if tree[0] in frame.variables:
-        corresponding_value = frame.variables[tree[0]]
-        del frame.variables[tree[0]]
+    if tree[1] in frame.variables:
+        corresponding_value = frame.variables[tree[1]]
+        del frame.variables[tree[1]]
         return corresponding_value
     else:
         raise SchemeNameError
 
 
-def evaluate_let(tree, frame):
+def let_frame(tree, frame):
+    """
+    Return the frame holding the bindings of a let expression
+    """
+    if len(tree) != 3:
+        raise SchemeEvaluationError
     binding_dict = {}
-    for binding in tree[0]:
+    for binding in tree[1]:
         binding_dict[binding[0]] = evaluate(binding[1], frame)
-    f1 = Frame(frame, binding_dict)
-    return evaluate(tree[1], f1)
+    return Frame(frame, binding_dict)
+
+
+def evaluate_let(tree, frame):
+    new_frame = let_frame(tree, frame)
+    return evaluate(tree[2], new_frame)
 
 
 def evaluate_set(var, exp, frame):
-    if var in frame.variables:
-        frame.variables[var] = exp
-    elif frame.parent is not None:
-        evaluate_set(var, exp, frame.parent)
-    else:
-        raise SchemeNameError
+    while frame is not None:
+        if var in frame.variables:
+            frame.variables[var] = exp
+            return
+        frame = frame.parent
+    raise SchemeNameError
+
+
+def evaluate_assignment(tree, frame):
+    if len(tree) != 3:
+        raise SchemeEvaluationError
+    exp = evaluate(tree[2], frame)
+    evaluate_set(tree[1], exp, frame)
+    return exp
+
+
+# special forms, keyed by the keyword that starts the expression; each
+# handler receives the whole expression and the current frame
+special_forms = intern_keys({
+    "define": evaluate_define,
+    "cons": evaluate_cons,
+    "begin": evaluate_begin,
+    "del": delete_variables,
+    "let": evaluate_let,
+    "set!": evaluate_assignment,
+    "list": lambda tree, frame: create_linked_list(tree[1:], frame),
+    "lambda": lambda tree, frame: Function(tree[1], tree[2], frame),
+    "and": evaluate_and,
+    "or": evaluate_or,
+    "if": evaluate_conditional,
+})
 
 
 def evaluate(tree, frame=Frame(None, scheme_builtins)):
@@ -519,46 +605,10 @@ def evaluate(tree, frame=Frame(None, scheme_builtins)):
         return simplify_non_list(tree, frame)
     if not tree:
         return []
-    if tree[0] == "define":
-        if isinstance(tree[1], list):
-            implicit_func = evaluate(["lambda", tree[1][1:], tree[2]], frame)
-            frame[tree[1][0]] = implicit_func
-            return frame[tree[1][0]]
-        else:
-            frame[tree[1]] = evaluate(tree[2], frame)
-            return frame[tree[1]]
-    if tree[0] == "cons":
-        if len(tree[1:]) != 2:
-            raise SchemeEvaluationError
-        if not tree[2]:
-            return Pair(tree[1], [])
-        return Pair(evaluate(tree[1], frame), evaluate(tree[2], frame))
-    if tree[0] == "begin":
-        for inp in tree[1:-1]:
-            evaluate(inp, frame)
-        return evaluate(tree[-1], frame)
-    if tree[0] == "del":
-        return delete_variables(tree[1:], frame)
-    if tree[0] == "let":
-        if len(tree) != 3:
-            raise SchemeEvaluationError
-        return evaluate_let(tree[1:], frame)
-    if tree[0] == "set!":
-        if len(tree) != 3:
-            raise SchemeEvaluationError
-        exp = evaluate(tree[2], frame)
-        evaluate_set(tree[1], exp, frame)
-        return exp
-    if tree[0] == "list":
-        return create_linked_list(tree[1:], frame)
-    if tree[0] == "lambda":
-        return Function(tree[1], tree[2], frame)
-    if tree[0] == "and":
-        return evaluate_and(tree[1:], frame)
-    if tree[0] == "or":
-        return evaluate_or(tree[1:], frame)
-    if tree[0] == "if":
-        return evaluate_conditional(tree, frame)
+    if isinstance(tree[0], str):
+        special_form = special_forms.get(tree[0])
+        if special_form is not None:
+            return special_form(tree, frame)
     evaluated_tree = evaluate(tree[0], frame)
     if not callable(evaluated_tree):
         raise SchemeEvaluationError
@@ -566,6 +616,38 @@ def evaluate(tree, frame=Frame(None, scheme_builtins)):
     return evaluated_tree(arguments)
 
 
+def evaluate_tail(tree, frame):
+    """
+    Evaluate the body of a Function.  Tail positions (the chosen branch of
+    an if, the last expression of a begin and the body of a let) are followed
+    in a loop, and a final call to another Function is returned as a TailCall
+    rather than made, so tail-recursive Scheme code runs in constant Python
+    stack space.
+    """
+    while isinstance(tree, list) and tree:
+        operator = tree[0]
+        if operator == "if":
+            tree = tree[2] if evaluate(tree[1], frame) else tree[3]
+        elif operator == "begin":
+            for inp in tree[1:-1]:
+                evaluate(inp, frame)
+            tree = tree[-1]
+        elif operator == "let":
+            frame = let_frame(tree, frame)
+            tree = tree[2]
+        elif isinstance(operator, str) and operator in special_forms:
+            return evaluate(tree, frame)
+        else:
+            evaluated_tree = evaluate(operator, frame)
+            if not callable(evaluated_tree):
+                raise SchemeEvaluationError
+            arguments = [evaluate(element, frame) for element in tree[1:]]
+            if isinstance(evaluated_tree, Function):
+                return TailCall(evaluated_tree, arguments)
+            return evaluated_tree(arguments)
+    return evaluate(tree, frame)
+
+
 def evaluate_file(file_name, frame=Frame(None, scheme_builtins)):
     with open(file_name, "r") as file:
         file_contents = file.read()
@@ -3,6 +3,10 @@
 
 #import typing
 import doctest
+import itertools
+import math
+import operator
+from collections import deque
 
 def dump(game):
     """
@@ -173,17 +177,7 @@ def render_2d_board(game, all_visible=False):
     ...                            [False, False, True, False]]})
     '.31_\\n__1_'
     """
-    nrows = game["dimensions"][0]
-    ncols = game["dimensions"][1]
-    game_display = render_2d_locations(game, all_visible)
-    ascii_art = ""
-
-    for row in range(nrows):
-        for col in range(ncols):
-            ascii_art += game_display[row][col]
-        ascii_art += "\n"
-
-    return ascii_art[:-1]
+    return "\n".join("".join(row) for row in render_2d_locations(game, all_visible))
 
 
 # N-D IMPLEMENTATION
@@ -193,17 +187,41 @@ def get_coordinate_value(nd_array, coordinates):
     """
     Given a specific coordinate, return value at that position
     """
-    current = nd_array[coordinates[0]]
-    for coordinate in coordinates[1:]:
+    current = nd_array
+    for coordinate in coordinates:
         current = current[coordinate]
     return current
 
 def replace_value(nd_array, coordinates, value):
-    if len(coordinates) == 1:
-        nd_array[coordinates[0]] = value
-        return 
-    first = coordinates[0]
-    return replace_value(nd_array[first], coordinates[1:], value)
+    for coordinate in coordinates[:-1]:
+        nd_array = nd_array[coordinate]
+    nd_array[coordinates[-1]] = value
+
+
+def reshape(flat_list, dimensions):
+    """
+    Given the values of a board in row-major order, return them as a
+    nested list with the specified dimensions
+    """
+    nested = flat_list
+    for axis in range(len(dimensions) - 1, 0, -1):
+        size = dimensions[axis]
+        nested = [
+            nested[i * size : (i + 1) * size]
+            for i in range(math.prod(dimensions[:axis]))
+        ]
+    return nested
+
+
+def flatten(nd_array, ndim):
+    """
+    Return an iterator over the values of an ndim-dimensional nested list
+    in row-major order, the inverse of reshape
+    """
+    flat = iter(nd_array)
+    for _ in range(ndim - 1):
+        flat = itertools.chain.from_iterable(flat)
+    return flat
 
 
 def make_nd_array(coordinates, value):
@@ -211,14 +229,7 @@ def make_nd_array(coordinates, value):
     Construct nested list with specified dimensions, with 
     each position in the list being the passed in value
     """
-
-    def nd_array_helper(num):
-        if num == len(coordinates):
-            return value
-        nested = [nd_array_helper(num + 1) for _ in range(coordinates[num])]
-        return nested
-
-    return nd_array_helper(0)
+    return reshape([value] * math.prod(coordinates), coordinates)
 
 
 def return_state(game):
@@ -228,105 +239,50 @@ def return_state(game):
     return game["state"]
 
 
-def get_board_coords(board):
-    """
-    Given a board, return a list of all the possible board coordinates
-    """
-    possible_coords = []
-
-    def get_coords_helper(nested_list, indices=None):
-        if indices is None:
-            indices = ()
-        for i, element in enumerate(nested_list):
-            current_index = indices + (i,)
-            if isinstance(element, list):
-                get_coords_helper(element, current_index)
-            else:
-                possible_coords.append(current_index)
-
-    get_coords_helper(board)
-    return possible_coords
-
-def possible_coords(coordinates):
-    nums = []
-    for coord in coordinates:
-        nums.append([i for i in range(coord)])
-    def helper(num_list):
-        if not num_list:
-            yield ()
-            return
-        for val in num_list[0]:
-            for comb in helper(num_list[1:]):
-                yield (val,) + comb
-    yield from helper(nums)
-
-def direction_vector(coordinate):
-    """
-    Given a coordinate, return a list of direction vectors. A
-    direction vector allows one to access adjacent squares in 
-    the board
-    """
-
-    def direction_inner(coordinate, previous, num):
-        if num == len(coordinate) - 1:
-            return previous
-        current_list = [
-            (previous_coord + (value,))
-            for previous_coord in previous
-            for value in (-1, 0, 1)
-        ]
-        return direction_inner(coordinate, current_list, num + 1)
-
-    return direction_inner(coordinate, [(-1,), (0,), (1,)], 0)
-
-
-def mine_check(change_vec, dimensions, position):
+def neighborhood(coordinates, dimensions):
     """
-    Check to see if adjacent positions are within range of the 
-    board dimensions. Return True if so, False otherwise.
+    Return the square at coordinates together with every adjacent square on
+    the board.  The range of each axis is clipped to the board once, so no
+    individual neighbor needs a bounds check.
     """
-    check = True
-    full_position = ()
-
-    for i, _ in enumerate(dimensions):
-        new_position = position[i] + change_vec[i]
-        full_position = full_position + (new_position,)
-        if not 0 <= new_position < dimensions[i]:
-            check = False
-    return check, full_position
+    return itertools.product(
+        *[
+            range(max(position - 1, 0), min(position + 2, dimension))
+            for position, dimension in zip(coordinates, dimensions)
+        ]
+    )
 
 
-def update_mine_neighbors(board, mine_loc, change, dimensions):
+def flat_strides(dimensions):
     """
-    Increment values of the squares adjacent to a mine by 1. 
+    Return how far apart neighbors along each axis are in the row-major
+    flattened board
     """
-    for change_vec in change:
-        check = mine_check(change_vec, dimensions, mine_loc)
-        if check[0] and get_coordinate_value(board, check[1]) != ".":
-            replace_value(board, check[1], get_coordinate_value(board, check[1]) + 1)
+    return [math.prod(dimensions[axis + 1:]) for axis in range(len(dimensions))]
 
 
-def num_to_success(game):
+def count_mine_neighbors(mines, dimensions):
     """
-    Return the required number of covered mines left to flip over
-    in order to win
+    Return a flat, row-major list holding the number of mines adjacent to
+    each square.  Mines away from the edge add one to a precomputed set of
+    flat offsets; only mines on the edge need a clipped neighborhood.
     """
-    def success_helper(nested_list, indices=None):
-        covered = 0
-        if indices is None:
-            indices = []
-        for i, element in enumerate(nested_list):
-            current_index = indices + [i]
-            if isinstance(element, list):
-                covered += success_helper(element, current_index)
-            else:
-                if get_coordinate_value(
-                    game["board"], current_index
-                ) != "." and not get_coordinate_value(game["visible"], current_index):
-                    covered += 1
-        return covered
-
-    return success_helper(game["board"])
+    strides = flat_strides(dimensions)
+    flat_offsets = [
+        sum(map(operator.mul, offset, strides))
+        for offset in itertools.product((-1, 0, 1), repeat=len(dimensions))
+    ]
+    counts = [0] * math.prod(dimensions)
+    for mine_loc in mines:
+        if all(0 < position < dimension - 1
+               for position, dimension in zip(mine_loc, dimensions)):
+            flat = sum(map(operator.mul, mine_loc, strides))
+            for offset in flat_offsets:
+                counts[flat + offset] += 1
+        else:
+            for neighbor in neighborhood(mine_loc, dimensions):
+                counts[sum(map(operator.mul, neighbor, strides))] += 1
+    return counts
 
 
 def new_game_nd(dimensions, mines):
@@ -355,13 +311,12 @@ def new_game_nd(dimensions, mines):
         [[False, False], [False, False], [False, False], [False, False]]
         [[False, False], [False, False], [False, False], [False, False]]
     """
-    board = make_nd_array(dimensions, 0)
-    for mine_location in mines:
-        replace_value(board, mine_location, ".")
-
-    change = direction_vector(tuple([0] * len(dimensions)))
-    for mine_location in mines:
-        update_mine_neighbors(board, mine_location, change, dimensions)
+    flat_board = count_mine_neighbors(mines, dimensions)
+    strides = flat_strides(dimensions)
+    mine_set = {sum(map(operator.mul, mine_loc, strides)) for mine_loc in mines}
+    for flat in mine_set:
+        flat_board[flat] = "."
+    board = reshape(flat_board, dimensions)
 
     visible = make_nd_array(dimensions, False)
 
@@ -370,9 +325,75 @@ def new_game_nd(dimensions, mines):
         "board": board,
         "state": "ongoing",
         "visible": visible,
+        "remaining_safe": math.prod(dimensions) - len(mine_set),
     }
 
 
+def _dig_flood(board, visible, start, dimensions):
+    """
+    Reveal start and flood out from it through squares with no adjacent
+    mines, updating visible in place.  Return (number revealed, whether start
+    was a mine).
+    """
+    if get_coordinate_value(board, start) == ".":
+        replace_value(visible, start, True)
+        return 1, True
+    if get_coordinate_value(visible, start):
+        return 0, False
+
+    replace_value(visible, start, True)
+    revealed = 1
+    # squares are marked visible as they are queued, so each is queued once;
+    # squares next to a 0 are never mines, so the fill cannot hit one
+    queue = deque([start])
+    while queue:
+        current = queue.popleft()
+        if get_coordinate_value(board, current) != 0:
+            continue
+        for neighbor in neighborhood(current, dimensions):
+            if not get_coordinate_value(visible, neighbor):
+                replace_value(visible, neighbor, True)
+                revealed += 1
+                queue.append(neighbor)
+    return revealed, False
+
+
+def _dig_flood_2d(board, visible, start, dimensions):
+    """
+    _dig_flood for 2-D boards, indexing rows and columns directly instead of
+    building coordinate tuples for every neighbor
+    """
+    nrows, ncols = dimensions
+    row, col = start
+    if board[row][col] == ".":
+        visible[row][col] = True
+        return 1, True
+    if visible[row][col]:
+        return 0, False
+
+    visible[row][col] = True
+    if board[row][col] != 0:
+        return 1, False
+    revealed = 1
+    # only squares with no adjacent mines are queued to spread further
+    queue = deque([(row, col)])
+    while queue:
+        row, col = queue.popleft()
+        for neighbor_row in range(max(row - 1, 0), min(row + 2, nrows)):
+            board_row = board[neighbor_row]
+            visible_row = visible[neighbor_row]
+            for neighbor_col in range(max(col - 1, 0), min(col + 2, ncols)):
+                if not visible_row[neighbor_col]:
+                    visible_row[neighbor_col] = True
+                    revealed += 1
+                    if board_row[neighbor_col] == 0:
+                        queue.append((neighbor_row, neighbor_col))
+    return revealed, False
+
+
+dig_floods = {2: _dig_flood_2d}
+
+
 def dig_nd(game, coordinates):
     """
     Recursively dig up square at coords and neighboring squares.
@@ -432,35 +453,30 @@ def dig_nd(game, coordinates):
         [[False, True], [False, True], [False, False], [False, False]]
         [[False, False], [False, False], [False, False], [False, False]]
     """
-    change = direction_vector(tuple([0] * len(game["dimensions"])))
-    to_reveal = num_to_success(game)
-
-    def dig_helper(game, coordinates):
-        if return_state(game) == "defeat" or return_state(game) == "victory":
-            return 0
-
-        if get_coordinate_value(game["board"], coordinates) == ".":
-            replace_value(game["visible"], coordinates, True)
-            game["state"] = "defeat"
-            return 1
-
-        if not get_coordinate_value(game["visible"], coordinates):
-            replace_value(game["visible"], coordinates, True)
-            revealed = 1
-        else:
-            return 0
-
-        if get_coordinate_value(game["board"], coordinates) == 0:
-            for change_vec in change:
-                check = mine_check(change_vec, game["dimensions"], coordinates)
-                if check[0] and not get_coordinate_value(game["visible"], check[1]):
-                    revealed += dig_helper(game, check[1])
-
-        if to_reveal == revealed:
-            game["state"] = "victory"
+    if return_state(game) == "defeat" or return_state(game) == "victory":
+        return 0
+
+    board = game["board"]
+    visible = game["visible"]
+    dimensions = game["dimensions"]
+    if "remaining_safe" not in game:
+        # games built by hand don't carry the counter, so count once here
+        game["remaining_safe"] = sum(
+            get_coordinate_value(board, coordinate) != "."
+            and not get_coordinate_value(visible, coordinate)
+            for coordinate in itertools.product(*map(range, dimensions))
+        )
+
+    dig_flood = dig_floods.get(len(dimensions), _dig_flood)
+    revealed, hit_mine = dig_flood(board, visible, coordinates, dimensions)
+    if hit_mine:
+        game["state"] = "defeat"
         return revealed
 
-    return dig_helper(game, coordinates)
+    game["remaining_safe"] -= revealed
+    if revealed and game["remaining_safe"] == 0:
+        game["state"] = "victory"
+    return revealed
 
 
 def render_nd(game, all_visible=False):
@@ -496,24 +512,16 @@ def render_nd(game, all_visible=False):
     [[['3', '.'], ['3', '3'], ['1', '1'], [' ', ' ']],
      [['.', '3'], ['3', '.'], ['1', '1'], [' ', ' ']]]
     """
-    game_display = make_nd_array(game["dimensions"], ".")
-    board_coords = get_board_coords(game["board"])
-
-    for coordinate in board_coords:
-        coordinate_value = get_coordinate_value(game["board"], coordinate)
-        if coordinate_value == 0:
-            replace_value(game_display, coordinate, " ")
-        else:
-            replace_value(game_display, coordinate, str(coordinate_value))
-
+    dimensions = game["dimensions"]
+    board = flatten(game["board"], len(dimensions))
     if all_visible:
-        return game_display
-
-    for coordinate in board_coords:
-        if not get_coordinate_value(game["visible"], coordinate):
-            replace_value(game_display, coordinate, "_")
-
-    return game_display
+        labels = [" " if value == 0 else str(value) for value in board]
+    else:
+        labels = [
+            ("_" if not shown else " " if value == 0 else str(value))
+            for value, shown in zip(board, flatten(game["visible"], len(dimensions)))
+        ]
+    return reshape(labels, dimensions)
 
 
 if __name__ == "__main__":
@@ -1,21 +1,16 @@
 # python implementation for parsing math expressions given in the form of strings
 
 import doctest
+import re
+
+TOKEN_PATTERN = re.compile(r"\(|\)|[^\s()]+")
+
 
 def tokenize(string):
     """
     Given a string, return a list of the separate tokens of the string
     """
-    modified_str = ""
-    for char in string:
-        if char == "(":
-            modified_str += char + " "
-        elif char == ")":
-            modified_str += " " + char
-        else:
-            modified_str += char
-    modified_str = modified_str.split(" ")
-    return [char for char in modified_str if char != ""]
+    return TOKEN_PATTERN.findall(string)
 
 
 def create_instance(left_exp, right_exp, operator):
@@ -23,34 +18,46 @@ def create_instance(left_exp, right_exp, operator):
     Helper function to return instance corresponding to operator 
     passed in. 
     """
-    if operator == "+":
-        return Add(left_exp, right_exp)
-    elif operator == "-":
-        return Sub(left_exp, right_exp)
-    elif operator == "*":
-        return Mul(left_exp, right_exp)
-    else:
-        return Div(left_exp, right_exp)
+    return operator_classes[operator](left_exp, right_exp)
+
+
+def parse_atom(token):
+    """
+    Return the Var or Num a single non-parenthesis token stands for
+    """
+    if token.isalpha():
+        return Var(token)
+    if "-" in token:
+        return Num(-float(token[1:]))
+    return Num(float(token))
 
 
 def parse(tokens):
     """
     Given a list of tokens, return python-readable expression
     """
-    def parse_expression(index):
-        if tokens[index].isalpha():
-            return (Var(tokens[index]), index + 1)
-        elif tokens[index] == "(":
-            left_sub, left_i = parse_expression(index + 1)
-            right_sub, right_i = parse_expression(left_i + 1)
-            return (create_instance(left_sub, right_sub, tokens[left_i]), right_i + 1)
+    # holds "(" markers, finished subexpressions and operator tokens; an
+    # operator is always the token right after "(" and its left operand
+    stack = []
+    for token in tokens:
+        if token == "(":
+            stack.append(token)
+            continue
+        if stack and isinstance(stack[-1], Symbol) and stack[-2] == "(":
+            stack.append(token)
+            continue
+        if token == ")":
+            right_exp = stack.pop()
+            operator = stack.pop()
+            left_exp = stack.pop()
+            stack.pop()
+            parsed = create_instance(left_exp, right_exp, operator)
         else:
-            if "-" in tokens[index]:
-                return (Num(-float(tokens[index][1:])), index + 1)
-            return (Num(float(tokens[index])), index + 1)
-
-    parsed_expression, _ = parse_expression(0)
-    return parsed_expression
+            parsed = parse_atom(token)
+        if not stack:
+            return parsed
+        stack.append(parsed)
+    raise ValueError("incomplete expression")
 
 
 def expression(string):
@@ -67,6 +74,7 @@ class Symbol:
     Object that represents any symbolic expression
     ex. x + 2*y - 3*z
     """
+    __slots__ = ()
     precedence = float("inf")
     wrap_right_at_same_precedence = False
 
@@ -94,14 +102,9 @@ class Symbol:
     def __rtruediv__(self, other):
         return Div(other, self)
 
-    def __eq__(self, other):
-        if not isinstance(self, type(other)):
-            return False
-        if isinstance(self, Var):
-            return self.__str__() == other.__str__()
-        if isinstance(self, Num):
-            return self.eval() == other.eval()
-        return self.left.__eq__(other.left) and self.right.__eq__(other.right)
+    def simplify(self):
+        # deriv reuses subtrees, so each distinct node is simplified only once
+        return self._simplify({})
 
 
 class Var(Symbol):
@@ -109,6 +112,8 @@ class Var(Symbol):
     Object that represents a single variable
     ex. x, y, A, z
     """
+    __slots__ = ("name",)
+
     def __init__(self, n):
         """
         Initializer.  Store an instance variable called `name`, containing the
@@ -122,18 +127,26 @@ class Var(Symbol):
     def __repr__(self):
         return f"Var('{self.name}')"
 
+    def __eq__(self, other):
+        if self is other:
+            return True
+        return isinstance(other, Var) and self.name == other.name
+
+    def __hash__(self):
+        return hash(self.name)
+
     def eval(self, mapping):
-        if str(self) in mapping:
-            return mapping[str(self)]
+        if self.name in mapping:
+            return mapping[self.name]
         else:
             raise NameError
 
     def deriv(self, wrespect):
-        if wrespect == str(self):
-            return Num(1)
-        return Num(0)
+        if wrespect == self.name:
+            return NUM_ONE
+        return NUM_ZERO
 
-    def simplify(self):
+    def _simplify(self, cache):
         return self
 
 
@@ -142,12 +155,24 @@ class Num(Symbol):
     Class that represents a number
     ex. 52, -11, 0.5
     """
+    __slots__ = ("n",)
+
     def __init__(self, n):
         """
         Initializer.  Store an instance variable called `n`, containing the
-        value passed in to the initializer.
+        value passed in to the initializer.  Num objects are immutable, since
+        NUM_ZERO and NUM_ONE are shared by every expression that uses them.
         """
-        self.n = n
+        object.__setattr__(self, "n", n)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Num objects are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Num objects are immutable")
+
+    def __reduce__(self):
+        return (Num, (self.n,))
 
     def __str__(self):
         return str(self.n)
@@ -155,16 +180,28 @@ class Num(Symbol):
     def __repr__(self):
         return f"Num({self.n})"
 
+    def __eq__(self, other):
+        if self is other:
+            return True
+        return isinstance(other, Num) and self.n == other.n
+
+    def __hash__(self):
+        return hash(self.n)
+
     def eval(self, _=0):
         return self.n
 
     def deriv(self, _):
-        return Num(0)
+        return NUM_ZERO
 
-    def simplify(self):
+    def _simplify(self, cache):
         return self
 
 
+NUM_ZERO = Num(0)
+NUM_ONE = Num(1)
+
+
 def convert_type(obj):
     """
     Convert an int or float to a Num object or convert a str
@@ -181,45 +218,70 @@ class BinOp(Symbol):
     """
     Superclass that represents a binary operation.
     """
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
-        self.left = convert_type(left)
-        self.right = convert_type(right)
+        self.left = left if isinstance(left, Symbol) else convert_type(left)
+        self.right = right if isinstance(right, Symbol) else convert_type(right)
+
+    @classmethod
+    def _raw(cls, left, right):
+        """
+        Build an instance from children that are already Symbols, skipping
+        the conversion in __init__
+        """
+        instance = cls.__new__(cls)
+        instance.left = left
+        instance.right = right
+        return instance
 
     def __str__(self):
-        str_left = self.left.__str__()
-        str_right = self.right.__str__()
+        str_left = str(self.left)
+        str_right = str(self.right)
         if self.left.precedence < self.precedence:
-            str_left = "(" + str_left + ")"
+            str_left = f"({str_left})"
         if self.right.precedence < self.precedence or (
             self.wrap_right_at_same_precedence
             and self.precedence == self.right.precedence
         ):
-            str_right = "(" + str_right + ")"
+            str_right = f"({str_right})"
 
-        return str_left + " " + self.operation + " " + str_right
+        return f"{str_left} {self.operation} {str_right}"
 
     def __repr__(self):
+        return f"{self.__class__.__name__}({self.left!r}, {self.right!r})"
+
+    def __eq__(self, other):
+        if self is other:
+            return True
         return (
-            str(self.__class__.__name__)
-            + "("
-            + self.left.__repr__()
-            + ", "
-            + self.right.__repr__()
-            + ")"
+            type(self) is type(other)
+            and self.left == other.left
+            and self.right == other.right
         )
 
-    def simplify(self):
-        simplified_left = self.left.simplify()
-        simplified_right = self.right.simplify()
+    def __hash__(self):
+        return hash((type(self), self.left, self.right))
+
+    def _simplify(self, cache):
+        key = id(self)
+        if key in cache:
+            return cache[key]
+        simplified_left = self.left._simplify(cache)
+        simplified_right = self.right._simplify(cache)
         if isinstance(simplified_left, Num) and isinstance(simplified_right, Num):
-            return self.num_eval(simplified_left, simplified_right)
-        return self.simplify_helper(simplified_left, simplified_right)
+            simplified = self.num_eval(simplified_left, simplified_right)
+        else:
+            simplified = self.simplify_helper(simplified_left, simplified_right)
+        cache[key] = simplified
+        return simplified
 
 
 class Add(BinOp):
     """
     Class objects represent adding two objects together 
     """
+    __slots__ = ()
     operation = "+"
     precedence = 1
 
@@ -230,20 +292,21 @@ class Add(BinOp):
         return Num(left.n + right.n)
 
     def deriv(self, wrespect):
-        return Add(self.left.deriv(wrespect), self.right.deriv(wrespect))
+        return Add._raw(self.left.deriv(wrespect), self.right.deriv(wrespect))
 
     def simplify_helper(self, left, right):
-        if left == Num(0) or right == Num(0):
-            if left == Num(0):
+        if left == NUM_ZERO or right == NUM_ZERO:
+            if left == NUM_ZERO:
                 return right
             return left
-        return Add(left, right)
+        return Add._raw(left, right)
 
 
 class Sub(BinOp):
     """
     Class objects represent subtracting the right object from the left
     """
+    __slots__ = ()
     wrap_right_at_same_precedence = True
     operation = "-"
     precedence = 1
@@ -255,18 +318,19 @@ class Sub(BinOp):
         return Num(left.n - right.n)
 
     def deriv(self, wrespect):
-        return Sub(self.left.deriv(wrespect), self.right.deriv(wrespect))
+        return Sub._raw(self.left.deriv(wrespect), self.right.deriv(wrespect))
 
     def simplify_helper(self, left, right):
-        if right == Num(0):
+        if right == NUM_ZERO:
             return left
-        return Sub(left, right)
+        return Sub._raw(left, right)
 
 
 class Mul(BinOp):
     """
     Class objects represent multiplying two objects together
     """
+    __slots__ = ()
     operation = "*"
     precedence = 2
 
@@ -277,25 +341,26 @@ class Mul(BinOp):
         return Num(left.n * right.n)
 
     def deriv(self, wrespect):
-        return Add(
-            Mul(self.left, self.right.deriv(wrespect)),
-            Mul(self.right, self.left.deriv(wrespect)),
+        return Add._raw(
+            Mul._raw(self.left, self.right.deriv(wrespect)),
+            Mul._raw(self.right, self.left.deriv(wrespect)),
         )
 
     def simplify_helper(self, left, right):
-        if left == Num(0) or right == Num(0):
-            return Num(0)
-        if left == Num(1) or right == Num(1):
-            if left == Num(1):
+        if left == NUM_ZERO or right == NUM_ZERO:
+            return NUM_ZERO
+        if left == NUM_ONE or right == NUM_ONE:
+            if left == NUM_ONE:
                 return right
             return left
-        return Mul(left, right)
+        return Mul._raw(left, right)
 
 
 class Div(BinOp):
     """
     Class objects represent dividing the right object from the left
     """
+    __slots__ = ()
     wrap_right_at_same_precedence = True
     operation = "/"
     precedence = 2
@@ -307,20 +372,23 @@ class Div(BinOp):
         return Num(left.n / right.n)
 
     def deriv(self, wrespect):
-        return Div(
-            Sub(
-                Mul(self.right, self.left.deriv(wrespect)),
-                Mul(self.left, self.right.deriv(wrespect)),
+        return Div._raw(
+            Sub._raw(
+                Mul._raw(self.right, self.left.deriv(wrespect)),
+                Mul._raw(self.left, self.right.deriv(wrespect)),
             ),
-            Mul(self.right, self.right),
+            Mul._raw(self.right, self.right),
         )
 
     def simplify_helper(self, left, right):
-        if left == Num(0):
-            return Num(0)
-        if right == Num(1):
+        if left == NUM_ZERO:
+            return NUM_ZERO
+        if right == NUM_ONE:
             return left
-        return Div(left, right)
+        return Div._raw(left, right)
+
+
+operator_classes = {"+": Add, "-": Sub, "*": Mul, "/": Div}
 
 
 if __name__ == "__main__":